@@ -1,15 +1,53 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import re
+import io
+import os
+import csv
+import json
+import time
+import sqlite3
 import asyncio
+import multiprocessing
+from types import SimpleNamespace
+from contextlib import closing
+from concurrent.futures import ProcessPoolExecutor
+from report_workers import (
+    AHOCORASICK_AVAILABLE,
+    SEO_FIELDS,
+    build_keyword_matcher,
+    extract_seo,
+    keyword_presence,
+    report_chunk
+)
+
+# Import crawl4ai components on first crawl
+@st.cache_resource
+def _get_crawl4ai():
+    """Import crawl4ai lazily, returning None if it is not installed"""
+    try:
+        from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode
+        from crawl4ai import MemoryAdaptiveDispatcher
+        from crawl4ai.extraction_strategy import JsonLxmlExtractionStrategy
+    except ImportError:
+        return None
+    return SimpleNamespace(
+        AsyncWebCrawler=AsyncWebCrawler,
+        BrowserConfig=BrowserConfig,
+        CrawlerRunConfig=CrawlerRunConfig,
+        CacheMode=CacheMode,
+        MemoryAdaptiveDispatcher=MemoryAdaptiveDispatcher,
+        JsonLxmlExtractionStrategy=JsonLxmlExtractionStrategy
+    )
 
-# Import crawl4ai components
+# Arrow-backed strings for the GSC text columns
 try:
-    from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode
-    CRAWL4AI_AVAILABLE = True
+    import pyarrow  # noqa: F401
+    PYARROW_AVAILABLE = True
 except ImportError:
-    CRAWL4AI_AVAILABLE = False
-    st.error("⚠️ crawl4ai is not installed. Please install it using: pip install crawl4ai")
+    PYARROW_AVAILABLE = False
+STRING_DTYPE = 'string[pyarrow]' if PYARROW_AVAILABLE else 'string'
 
 # Page configuration
 st.set_page_config(
@@ -29,18 +67,20 @@ eliminating the need for Screaming Frog exports.
 st.sidebar.header("⚙️ Configuration")
 
 # Branded terms input
-branded_terms = st.sidebar.text_area(
+branded_terms_input = st.sidebar.text_area(
     "Branded Terms to Exclude (one per line)",
     placeholder="yourbrand\ncompany name\nbrand variations",
     help="Enter branded terms to exclude from analysis"
-).strip().split('\n') if st.sidebar.text_area else []
+)
+branded_terms = [t for t in branded_terms_input.strip().split('\n') if t.strip()] if branded_terms_input else []
 
 # URL exclusions input
-excluded_urls = st.sidebar.text_area(
+excluded_urls_input = st.sidebar.text_area(
     "URLs to Exclude (one per line - EXACT MATCH)",
     placeholder="https://www.trysnow.com/blogs/news\n/admin\n/search",
     help="Enter exact URLs to exclude"
-).strip().split('\n') if st.sidebar.text_area else []
+)
+excluded_urls = [u for u in excluded_urls_input.strip().split('\n') if u.strip()] if excluded_urls_input else []
 
 # Top keywords setting
 top_keywords_count = st.sidebar.number_input(
@@ -50,10 +90,60 @@ top_keywords_count = st.sidebar.number_input(
     max_value=20
 )
 
+# Crawl cache setting
+cache_ttl_days = st.sidebar.number_input(
+    "Crawl Cache TTL (days)",
+    value=7,
+    min_value=0,
+    max_value=90,
+    help="Reuse crawl results younger than this many days (0 disables the cache)"
+)
+
+# Crawl concurrency setting
+crawl_concurrency = st.sidebar.number_input(
+    "Concurrent Crawls",
+    value=10,
+    min_value=1,
+    max_value=50,
+    help="Pages crawled in parallel. Throughput plateaus once the site or your "
+         "machine saturates; raising it past that point only adds timeouts."
+)
+
 # Fixed settings
 min_position = 4
 max_position = 20
 
+# URLs containing any of these characters are parameterized and always excluded
+URL_PARAMETER_PATTERN = r'[?=#]'
+
+# Accepted names for the GSC landing page column, in order of preference
+LANDING_PAGE_COLUMNS = ['landing page', 'landing pages', 'address', 'url', 'urls', 'page', 'top pages']
+
+# Upload columns read by the analysis (lowercased); all others are skipped
+GSC_INPUT_COLUMNS = {'query', 'clicks', 'position', *LANDING_PAGE_COLUMNS}
+
+# Heading extraction done by crawl4ai during the crawl (lxml-backed)
+HEADINGS_SCHEMA = {
+    "name": "seo",
+    "baseSelector": "html",
+    "fields": [
+        {"name": "h1", "selector": "h1", "type": "list", "fields": [{"name": "text", "type": "text"}]},
+        {"name": "h2", "selector": "h2", "type": "list", "fields": [{"name": "text", "type": "text"}]}
+    ]
+}
+
+# Branded term lists longer than this are matched with Aho-Corasick instead of a regex
+BRANDED_AUTOMATON_MIN_TERMS = 1000
+
+# Reports with at least this many keyword rows are assembled across processes
+REPORT_PARALLEL_MIN_ROWS = 50000
+
+# Persistent cache of extracted SEO elements
+CRAWL_CACHE_PATH = os.path.expanduser('~/.striking_distance_cache.sqlite')
+
+# URLs looked up per crawl cache query
+CRAWL_CACHE_BATCH_SIZE = 500
+
 # File uploaders
 st.header("📊 Google Search Console Data")
 gsc_file = st.file_uploader(
@@ -62,78 +152,76 @@ gsc_file = st.file_uploader(
     help="Export from GSC with Query, Landing Page, Clicks, Position"
 )
 
-def load_file(file):
-    """Load CSV or Excel file into pandas DataFrame"""
+def _is_gsc_input_column(col):
+    """Check whether an uploaded column is one the analysis uses"""
+    return str(col).strip().lower() in GSC_INPUT_COLUMNS
+
+@st.cache_data
+def load_bytes(name, data):
+    """Load CSV or Excel file contents into pandas DataFrame"""
     try:
-        file_ext = file.name.lower().split('.')[-1]
+        file_ext = name.lower().split('.')[-1]
         
         if file_ext == 'csv':
-            file_content = file.read()
-            file.seek(0)
-            
-            first_line = file_content.decode('utf-8').split('\n')[0]
+            # Sniff the delimiter and header from the first 4 KB only
+            first_line = data[:4096].decode('utf-8-sig', errors='ignore').split('\n')[0].rstrip('\r')
             if ';' in first_line and ',' not in first_line:
-                df = pd.read_csv(file, delimiter=';')
+                delimiter = ';'
             elif '\t' in first_line:
-                df = pd.read_csv(file, delimiter='\t')
+                delimiter = '\t'
             else:
-                df = pd.read_csv(file)
+                delimiter = ','
+            
+            # Only read the columns the analysis uses
+            header = next(csv.reader([first_line], delimiter=delimiter), [])
+            usecols = [col for col in header if col.strip().lower() in GSC_INPUT_COLUMNS] or None
+            
+            engine_options = {'engine': 'pyarrow', 'dtype_backend': 'pyarrow'} if PYARROW_AVAILABLE else {}
+            df = pd.read_csv(io.BytesIO(data), delimiter=delimiter, usecols=usecols, **engine_options)
             
             df.columns = df.columns.str.strip()
             return df
             
         elif file_ext == 'xlsx':
-            return pd.read_excel(file, engine='openpyxl')
+            return pd.read_excel(io.BytesIO(data), engine='openpyxl', usecols=_is_gsc_input_column)
         elif file_ext == 'xls':
-            return pd.read_excel(file, engine='xlrd')
+            return pd.read_excel(io.BytesIO(data), engine='xlrd', usecols=_is_gsc_input_column)
         else:
-            raise ValueError(f"Unsupported file format: {file.name}")
+            raise ValueError(f"Unsupported file format: {name}")
     except Exception as e:
-        st.error(f"Error reading file {file.name}: {str(e)}")
+        st.error(f"Error reading file {name}: {str(e)}")
         raise
 
-def clean_url(url):
-    """Standardize URL format"""
-    if pd.isna(url):
-        return ""
-    url = str(url).strip()
-    url = url.rstrip('/')
-    return url
-
-def check_keyword_presence(keyword, text):
-    """Check if keyword exists in text"""
-    if pd.isna(keyword) or pd.isna(text) or keyword == "" or text == "":
-        return None
-    
-    keyword_lower = str(keyword).lower().strip()
-    text_lower = str(text).lower()
-    
-    return keyword_lower in text_lower
+def normalize_excluded_urls(excluded_urls):
+    """Normalize the exclusion list once into a set of exact-match URLs"""
+    normalized = frozenset(e.strip().rstrip('/') for e in excluded_urls if e.strip())
+    with_scheme = frozenset(
+        f'{scheme}://{e}'
+        for e in normalized if not e.startswith('http')
+        for scheme in ('https', 'http')
+    )
+    return normalized | with_scheme
 
-def should_exclude_url(url, excluded_urls):
-    """Check if URL should be excluded"""
-    if any(param in str(url) for param in ['?', '=', '#']):
-        return True
-    
-    if excluded_urls:
-        normalized_url = str(url).rstrip('/')
-        for excluded in excluded_urls:
-            excluded = excluded.strip()
-            if excluded:
-                excluded_normalized = excluded.rstrip('/')
-                if normalized_url == excluded_normalized:
-                    return True
-    return False
+def branded_keyword_mask(keywords, branded_terms):
+    """Flag keywords that contain any branded term"""
+    if AHOCORASICK_AVAILABLE and len(branded_terms) > BRANDED_AUTOMATON_MIN_TERMS:
+        # Very long alternations are slow in re; an automaton stays linear
+        matcher = build_keyword_matcher([term.lower() for term in branded_terms])
+        return keywords.map(lambda k: next(matcher.iter(str(k).lower()), None) is not None)
+    # One alternation for all terms; Arrow and re each compile it in their own kernel
+    pattern = '|'.join(re.escape(term) for term in branded_terms)
+    return keywords.str.contains(pattern, case=False, na=False)
 
+@st.cache_data
 def process_gsc_data(df, branded_terms, excluded_urls):
     """Process Google Search Console data"""
     df.columns = df.columns.str.strip()
     
     # Find required columns
-    query_col = next((col for col in df.columns if col.lower() == 'query'), None)
-    landing_col = next((col for col in df.columns 
-                       if col.lower() in ['landing page', 'address', 'url']), None)
-    clicks_col = next((col for col in df.columns if col.lower() == 'clicks'), None)
+    lut = {col.lower(): col for col in df.columns}
+    query_col = lut.get('query')
+    landing_col = next((lut[name] for name in LANDING_PAGE_COLUMNS if name in lut), None)
+    clicks_col = lut.get('clicks')
     
     if not all([query_col, landing_col, clicks_col]):
         missing = []
@@ -151,13 +239,18 @@ def process_gsc_data(df, branded_terms, excluded_urls):
     })
     
     # Clean data
-    df['URL'] = df['URL'].apply(clean_url)
+    df = df.astype({'URL': STRING_DTYPE, 'Keyword': STRING_DTYPE})
+    df['URL'] = df['URL'].fillna('').str.strip().str.rstrip('/')
     df = df[df['URL'].notna() & (df['URL'] != '')]
     df = df[df['Keyword'].notna() & (df['Keyword'] != '')]
     
-    # Exclude URLs
+    # Exclude URLs with parameters or on the exclusion list
     initial_count = len(df)
-    df = df[~df['URL'].apply(lambda x: should_exclude_url(x, excluded_urls))]
+    excluded_set = normalize_excluded_urls(excluded_urls)
+    exclude_mask = df['URL'].str.contains(URL_PARAMETER_PATTERN, regex=True, na=False)
+    if excluded_set:
+        exclude_mask |= df['URL'].isin(excluded_set)
+    df = df[~exclude_mask]
     excluded_count = initial_count - len(df)
     if excluded_count > 0:
         st.info(f"Excluded {excluded_count} URLs")
@@ -168,7 +261,7 @@ def process_gsc_data(df, branded_terms, excluded_urls):
     
     # Filter by position
     if 'Position' in df.columns:
-        df['Position'] = pd.to_numeric(df['Position'], errors='coerce')
+        df['Position'] = pd.to_numeric(df['Position'], errors='coerce').astype('float64')
         df = df[(df['Position'] >= min_position) & (df['Position'] <= max_position)]
     else:
         df['Position'] = 10.0
@@ -177,9 +270,10 @@ def process_gsc_data(df, branded_terms, excluded_urls):
     if branded_terms:
         branded_terms_clean = [term.strip() for term in branded_terms if term.strip()]
         if branded_terms_clean:
-            pattern = '|'.join([re.escape(term) for term in branded_terms_clean])
-            df = df[~df['Keyword'].str.contains(pattern, case=False, na=False)]
+            df = df[~branded_keyword_mask(df['Keyword'], branded_terms_clean)]
     
+    # URLs repeat across keywords; integer category codes keep sorting and groupby cheap
+    df['URL'] = df['URL'].astype('category')
     df = df.sort_values(['URL', 'Clicks'], ascending=[True, False])
     
     if len(df) == 0:
@@ -187,21 +281,113 @@ def process_gsc_data(df, branded_terms, excluded_urls):
     
     return df
 
-async def crawl_url_simple(url, crawler):
-    """Simple crawl function using crawl4ai"""
+def _open_crawl_cache():
+    """Open the crawl cache database, creating the table if needed"""
+    conn = sqlite3.connect(CRAWL_CACHE_PATH)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS cache (url TEXT PRIMARY KEY, ts INTEGER, payload BLOB)"
+    )
+    return conn
+
+def load_cached_crawls(urls, ttl_days):
+    """Return cached crawl results younger than ttl_days, keyed by URL"""
+    min_ts = int(time.time() - ttl_days * 86400)
+    cached = {}
+    try:
+        with closing(_open_crawl_cache()) as conn:
+            # Look URLs up in batches, staying under SQLite's bound-parameter limit
+            for start in range(0, len(urls), CRAWL_CACHE_BATCH_SIZE):
+                batch = urls[start:start + CRAWL_CACHE_BATCH_SIZE]
+                placeholders = ', '.join('?' * len(batch))
+                rows = conn.execute(
+                    f"SELECT url, payload FROM cache WHERE ts > ? AND url IN ({placeholders})",
+                    (min_ts, *batch)
+                )
+                for url, payload in rows:
+                    cached[url] = add_lowercase_fields(json.loads(payload))
+    except sqlite3.Error:
+        return {}
+    return cached
+
+def save_crawl_results(results, ttl_days):
+    """Store successful crawl results in the crawl cache, dropping expired entries"""
+    now = int(time.time())
+    # Lowercased copies are rebuilt on load, so don't store them
+    rows = [
+        (r['URL'], now, json.dumps({k: v for k, v in r.items() if not k.endswith('_lc')}))
+        for r in results if r['Success']
+    ]
+    if not rows:
+        return
+    try:
+        with closing(_open_crawl_cache()) as conn, conn:
+            conn.execute("DELETE FROM cache WHERE ts <= ?", (int(now - ttl_days * 86400),))
+            conn.executemany(
+                "INSERT OR REPLACE INTO cache (url, ts, payload) VALUES (?, ?, ?)", rows
+            )
+    except sqlite3.Error:
+        pass
+
+@st.cache_resource
+def get_parse_pool():
+    """Shared process pool for CPU-bound HTML parsing"""
+    # Spawn instead of forking the multi-threaded server; workers start once and are reused
+    return ProcessPoolExecutor(
+        max_workers=os.cpu_count(),
+        mp_context=multiprocessing.get_context('spawn')
+    )
+
+def _headings_from_extracted(extracted_content):
+    """Read H1/H2 text from crawl4ai's CSS extraction output, None if unavailable"""
+    try:
+        items = json.loads(extracted_content) if extracted_content else []
+    except (TypeError, ValueError):
+        return None
+    if not items:
+        return None
+    
+    page = items[0]
+    return {
+        'H1': ' '.join((h.get('text') or '').strip() for h in page.get('h1') or []),
+        'H2': ' '.join((h.get('text') or '').strip() for h in page.get('h2') or [])
+    }
+
+def add_lowercase_fields(crawl_data):
+    """Store a lowercased copy of each SEO field for keyword matching"""
+    for field in SEO_FIELDS:
+        crawl_data.setdefault(f'{field}_lc', (crawl_data.get(field) or '').lower())
+    return crawl_data
+
+async def process_crawl_result(result):
+    """Convert a crawl4ai result into the report's crawl data"""
+    url = result.url
     try:
-        result = await crawler.arun(url=url)
         if result.success:
-            return {
+            markdown = str(result.markdown) if result.markdown else ''
+            headings = _headings_from_extracted(result.extracted_content)
+            if headings is not None:
+                # crawl4ai already parsed the page; reuse its metadata and headings
+                metadata = result.metadata or {}
+                seo = {
+                    'Title': (metadata.get('title') or '').strip(),
+                    'Meta Description': (metadata.get('description') or '').strip(),
+                    **headings,
+                    'Body': markdown[:3000]
+                }
+            else:
+                # Parse off the event loop so other crawls keep downloading
+                seo = await asyncio.get_running_loop().run_in_executor(
+                    get_parse_pool(),
+                    extract_seo,
+                    result.html,
+                    markdown
+                )
+            return add_lowercase_fields({
                 'URL': url,
-                'Title': result.metadata.get('title', ''),
-                'Meta Description': result.metadata.get('description', ''),
-                'H1': result.metadata.get('h1', ''),
-                'H2': ' '.join(result.metadata.get('h2', [])),
-                'Body': result.markdown[:3000] if result.markdown else '',
+                **seo,
                 'Success': True,
                 'Error': None
-            }
+            })
         else:
             return {
                 'URL': url,
@@ -211,7 +397,7 @@ async def crawl_url_simple(url, crawler):
                 'H2': '',
                 'Body': '',
                 'Success': False,
-                'Error': str(result.error)
+                'Error': str(result.error_message)
             }
     except Exception as e:
         return {
@@ -225,95 +411,98 @@ async def crawl_url_simple(url, crawler):
             'Error': str(e)
         }
 
-async def crawl_urls_async(urls, progress_bar=None, status_text=None):
-    """Crawl multiple URLs asynchronously"""
-    if not CRAWL4AI_AVAILABLE:
+async def crawl_urls_async(urls, max_sessions=10, progress_bar=None, on_result=None):
+    """Crawl multiple URLs asynchronously, handling each result as it completes"""
+    crawl4ai = _get_crawl4ai()
+    if crawl4ai is None:
+        st.error("⚠️ crawl4ai is not installed. Please install it using: pip install crawl4ai")
         return []
     
-    browser_config = BrowserConfig(
+    browser_config = crawl4ai.BrowserConfig(
         headless=True,
         verbose=False
     )
     
-    crawler_config = CrawlerRunConfig(
-        cache_mode=CacheMode.ENABLED
+    crawler_config = crawl4ai.CrawlerRunConfig(
+        cache_mode=crawl4ai.CacheMode.ENABLED,
+        extraction_strategy=crawl4ai.JsonLxmlExtractionStrategy(HEADINGS_SCHEMA),
+        stream=True
+    )
+    
+    # One shared browser; crawl4ai schedules pages and backs off under memory pressure
+    dispatcher = crawl4ai.MemoryAdaptiveDispatcher(
+        memory_threshold_percent=80.0,
+        max_session_permit=max_sessions
     )
     
     results = []
+    last_update = 0.0
     
-    async with AsyncWebCrawler(config=browser_config) as crawler:
-        for i, url in enumerate(urls):
-            if progress_bar:
-                progress_bar.progress((i + 1) / len(urls))
-            if status_text:
-                status_text.text(f"Crawling {i + 1}/{len(urls)}: {url}")
-            
-            result = await crawl_url_simple(url, crawler)
+    async with crawl4ai.AsyncWebCrawler(config=browser_config) as crawler:
+        async for crawl_result in await crawler.arun_many(
+            urls=list(urls),
+            config=crawler_config,
+            dispatcher=dispatcher
+        ):
+            result = await process_crawl_result(crawl_result)
             results.append(result)
+            
+            # Each widget update is a websocket round-trip; cap them at ~10 per second
+            now = time.monotonic()
+            refresh = now - last_update > 0.1 or len(results) == len(urls)
+            if refresh:
+                last_update = now
+            if progress_bar and refresh:
+                progress_bar.progress(
+                    len(results) / len(urls),
+                    text=f"Crawled {len(results)}/{len(urls)}: {result['URL']}"
+                )
+            if on_result:
+                on_result(result, refresh)
     
     return results
 
-def create_striking_distance_report(gsc_df, crawl_results):
+def select_top_keywords(gsc_df, top_n):
+    """Keep the top_n keywords by clicks for each URL"""
+    # process_gsc_data already sorts by URL, then Clicks descending
+    return gsc_df.groupby('URL', sort=False, observed=True).head(top_n)
+
+def _rows_for_url(url_df, crawl_data):
+    """Build report rows for one URL's top keywords"""
+    keywords_lower = url_df['Keyword'].astype(str).str.lower().str.strip().tolist()
+    return url_df[['URL', 'Keyword', 'Clicks', 'Position']].assign(
+        **keyword_presence(keywords_lower, crawl_data)
+    )
+
+def create_striking_distance_report(top_df, crawl_results):
     """Create the final striking distance report"""
-    report_data = []
-    
     # Create a mapping of URL to crawl data
     crawl_map = {result['URL']: result for result in crawl_results if result['Success']}
     
-    # Group GSC data by URL and get top keywords
-    url_keywords = {}
-    for _, row in gsc_df.iterrows():
-        url = row['URL']
-        if url not in url_keywords:
-            url_keywords[url] = []
-        url_keywords[url].append({
-            'Keyword': row['Keyword'],
-            'Clicks': row['Clicks'],
-            'Position': row['Position']
-        })
-    
-    # Process each URL and its keywords
-    for url, keywords in url_keywords.items():
-        # Get top keywords for this URL
-        top_keywords = sorted(keywords, key=lambda x: x['Clicks'], reverse=True)[:top_keywords_count]
-        
-        # Get crawl data for this URL
-        crawl_data = crawl_map.get(url, {
-            'Title': '',
-            'Meta Description': '',
-            'H1': '',
-            'H2': '',
-            'Body': ''
-        })
-        
-        # Check each keyword against the content
-        for keyword_data in top_keywords:
-            keyword = keyword_data['Keyword']
-            clicks = keyword_data['Clicks']
-            position = keyword_data['Position']
-            
-            in_title = check_keyword_presence(keyword, crawl_data.get('Title', ''))
-            in_meta = check_keyword_presence(keyword, crawl_data.get('Meta Description', ''))
-            in_h1 = check_keyword_presence(keyword, crawl_data.get('H1', ''))
-            in_h2 = check_keyword_presence(keyword, crawl_data.get('H2', ''))
-            in_body = check_keyword_presence(keyword, crawl_data.get('Body', ''))
-            
-            report_data.append({
-                'URL': url,
-                'Keyword': keyword,
-                'Clicks': clicks,
-                'Position': position,
-                'In Title': in_title if in_title is not None else False,
-                'In Meta Description': in_meta if in_meta is not None else False,
-                'In H1': in_h1 if in_h1 is not None else False,
-                'In H2': in_h2 if in_h2 is not None else False,
-                'In Body': in_body if in_body is not None else False
-            })
+    n_chunks = os.cpu_count() or 1
+    if len(top_df) < REPORT_PARALLEL_MIN_ROWS or n_chunks < 2:
+        # Small reports, or a single CPU, aren't worth pickling to a worker
+        report_df = report_chunk(top_df, crawl_map)
+    else:
+        # Split by URL hash so every URL's keywords land in the same worker
+        chunk_ids = pd.util.hash_pandas_object(top_df['URL'], index=False).to_numpy() % n_chunks
+        futures = []
+        for chunk_id in range(n_chunks):
+            chunk = top_df[chunk_ids == chunk_id]
+            if len(chunk) == 0:
+                continue
+            chunk_crawls = {url: crawl_map[url] for url in chunk['URL'].unique() if url in crawl_map}
+            futures.append(get_parse_pool().submit(report_chunk, chunk, chunk_crawls))
+        report_df = pd.concat([future.result() for future in futures], ignore_index=True)
     
-    report_df = pd.DataFrame(report_data)
     report_df = report_df.sort_values(['URL', 'Clicks'], ascending=[True, False])
     return report_df
 
+@st.cache_data
+def report_to_csv(report_df):
+    """Serialize the report to CSV bytes for download"""
+    return report_df.to_csv(index=False).encode('utf-8')
+
 # Main processing
 if gsc_file:
     st.success("✅ GSC file uploaded successfully!")
@@ -327,28 +516,72 @@ if 'start_analysis' in st.session_state and st.session_state['start_analysis']:
     try:
         # Load data
         with st.spinner("Loading GSC data..."):
-            gsc_df = load_file(gsc_file)
+            gsc_df = load_bytes(gsc_file.name, gsc_file.getvalue())
         
         # Process data
         with st.spinner("Processing GSC data..."):
-            processed_gsc = process_gsc_data(gsc_df, branded_terms, excluded_urls)
+            processed_gsc = process_gsc_data(gsc_df, tuple(branded_terms), tuple(excluded_urls))
             
         if processed_gsc is not None and len(processed_gsc) > 0:
-            # Get unique URLs to crawl
-            unique_urls = processed_gsc['URL'].unique()
+            # Get unique URLs to crawl, highest-click URLs first
+            url_clicks = (
+                processed_gsc.groupby('URL', sort=False, observed=True)['Clicks']
+                .sum()
+                .sort_values(ascending=False)
+            )
+            unique_urls = url_clicks.index.tolist()
+            top_gsc = select_top_keywords(processed_gsc, top_keywords_count)
+            url_positions = top_gsc.groupby('URL', sort=False, observed=True).indices
             st.info(f"Found {len(unique_urls)} unique URLs to crawl")
             
             # Crawl URLs
             with st.spinner("Crawling URLs with AI..."):
                 progress_bar = st.progress(0)
-                status_text = st.empty()
+                live_table = st.empty()
                 
-                # Run async crawling
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                crawl_results = loop.run_until_complete(
-                    crawl_urls_async(unique_urls, progress_bar, status_text)
-                )
+                # Report rows built so far; these also make up the final report
+                live_frames = []
+                reported_urls = set()
+                
+                def show_partial_report(result, refresh):
+                    positions = url_positions.get(result['URL'])
+                    if result['Success'] and positions is not None:
+                        live_frames.append(_rows_for_url(top_gsc.iloc[positions], result))
+                        reported_urls.add(result['URL'])
+                    if refresh and live_frames:
+                        live_table.dataframe(pd.concat(live_frames[-20:]).tail(20))
+                
+                # Reuse fresh results from the crawl cache, matched in one batch
+                cached_results = {}
+                if cache_ttl_days > 0:
+                    cached_results = load_cached_crawls(unique_urls, cache_ttl_days)
+                    if cached_results:
+                        st.info(f"Loaded {len(cached_results)} URLs from the crawl cache")
+                        cached_top = top_gsc[top_gsc['URL'].isin(list(cached_results))]
+                        live_frames.append(
+                            create_striking_distance_report(cached_top, cached_results.values())
+                        )
+                        reported_urls.update(cached_results)
+                        live_table.dataframe(live_frames[-1].tail(20))
+                urls_to_crawl = [url for url in unique_urls if url not in cached_results]
+                
+                crawl_results = list(cached_results.values())
+                if urls_to_crawl:
+                    # Run async crawling
+                    new_results = asyncio.run(
+                        crawl_urls_async(
+                            urls_to_crawl,
+                            crawl_concurrency,
+                            progress_bar,
+                            show_partial_report
+                        )
+                    )
+                    if cache_ttl_days > 0:
+                        save_crawl_results(new_results, cache_ttl_days)
+                    crawl_results.extend(new_results)
+                else:
+                    progress_bar.progress(1.0, text="All URLs loaded from the crawl cache")
+                live_table.empty()
                 
                 # Filter successful crawls
                 successful_crawls = [r for r in crawl_results if r['Success']]
@@ -361,9 +594,18 @@ if 'start_analysis' in st.session_state and st.session_state['start_analysis']:
                             st.write(f"- {fail['URL']}: {fail['Error']}")
                 
                 if len(successful_crawls) > 0:
-                    # Create final report
+                    # Create final report from the rows already matched, flagging
+                    # URLs without crawl data as missing everywhere
                     with st.spinner("Creating striking distance report..."):
-                        report = create_striking_distance_report(processed_gsc, successful_crawls)
+                        unreported_top = top_gsc[~top_gsc['URL'].isin(list(reported_urls))]
+                        live_frames.append(
+                            unreported_top[['URL', 'Keyword', 'Clicks', 'Position']].assign(
+                                **{f'In {field}': False for field in SEO_FIELDS}
+                            )
+                        )
+                        report = pd.concat(live_frames, ignore_index=True).sort_values(
+                            ['URL', 'Clicks'], ascending=[True, False]
+                        )
                     
                     # Display results
                     st.success(f"✅ Analysis complete! Found {len(report['URL'].unique())} URLs with striking distance keywords.")
@@ -375,22 +617,10 @@ if 'start_analysis' in st.session_state and st.session_state['start_analysis']:
                     with col2:
                         st.metric("Total Keywords Analyzed", len(report))
                     with col3:
-                        potential_clicks = 0
-                        for _, row in report.iterrows():
-                            missing_count = 0
-                            if not row['In Title']:
-                                missing_count += 1
-                            if not row['In Meta Description']:
-                                missing_count += 1
-                            if not row['In H1']:
-                                missing_count += 1
-                            if not row['In H2']:
-                                missing_count += 1
-                            if not row['In Body']:
-                                missing_count += 1
-                            
-                            weight = min(0.5, missing_count * 0.1)
-                            potential_clicks += row['Clicks'] * weight
+                        flag_columns = [f'In {field}' for field in SEO_FIELDS]
+                        missing_count = (~report[flag_columns]).sum(axis=1)
+                        weight = np.minimum(0.5, missing_count * 0.1)
+                        potential_clicks = (report['Clicks'] * weight).sum()
                         
                         st.metric("Weighted Click Potential", int(potential_clicks))
                     
@@ -398,10 +628,9 @@ if 'start_analysis' in st.session_state and st.session_state['start_analysis']:
                     st.header("📊 Full Report")
                     
                     # Create download button
-                    csv = report.to_csv(index=False)
                     st.download_button(
                         label="📥 Download Full Report (CSV)",
-                        data=csv,
+                        data=report_to_csv(report),
                         file_name="striking_distance_report.csv",
                         mime="text/csv"
                     )
@@ -0,0 +1,90 @@
+"""
+Report and parsing helpers that run in worker processes.
+They live outside the Streamlit script so the process pool can pickle them by reference.
+"""
+
+import numpy as np
+from bisect import bisect_right
+from itertools import accumulate
+
+# Multi-keyword matching
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+# On-page elements checked for keyword presence
+SEO_FIELDS = ['Title', 'Meta Description', 'H1', 'H2', 'Body']
+
+def extract_seo(html, markdown):
+    """Extract SEO elements from crawled HTML (runs in a worker process)"""
+    from bs4 import BeautifulSoup
+    
+    soup = BeautifulSoup(html or '', 'html.parser')
+    
+    title = soup.find('title')
+    meta_desc = soup.find('meta', attrs={'name': 'description'})
+    h1_tags = soup.find_all('h1')
+    h2_tags = soup.find_all('h2')
+    
+    return {
+        'Title': title.get_text().strip() if title else '',
+        'Meta Description': meta_desc.get('content', '').strip() if meta_desc else '',
+        'H1': ' '.join(h.get_text().strip() for h in h1_tags),
+        'H2': ' '.join(h.get_text().strip() for h in h2_tags),
+        'Body': markdown[:3000] if markdown else ''
+    }
+
+def build_keyword_matcher(keywords):
+    """Build one Aho-Corasick automaton over all (lowercased) keywords"""
+    if not AHOCORASICK_AVAILABLE or not any(keywords):
+        return None
+    
+    automaton = ahocorasick.Automaton()
+    for keyword in keywords:
+        if keyword:
+            automaton.add_word(keyword, keyword)
+    automaton.make_automaton()
+    return automaton
+
+def find_keywords(matcher, keywords, texts_lower):
+    """Return, for each lowercased text, the set of keywords it contains"""
+    if matcher is None:
+        return [{keyword for keyword in keywords if keyword and keyword in text} for text in texts_lower]
+    
+    # Join with a separator no keyword contains so one walk covers every text
+    hits = [set() for _ in texts_lower]
+    text_ends = list(accumulate(len(text) + 1 for text in texts_lower))
+    for end_index, keyword in matcher.iter('\x00'.join(texts_lower)):
+        hits[bisect_right(text_ends, end_index)].add(keyword)
+    return hits
+
+def keyword_presence(keywords_lower, crawl_data):
+    """Flag which keywords appear in each SEO field of one crawled page"""
+    # Scan all fields once for all of this URL's keywords
+    matcher = build_keyword_matcher(keywords_lower)
+    texts_lower = [crawl_data.get(f'{field}_lc') or '' for field in SEO_FIELDS]
+    hits = find_keywords(matcher, keywords_lower, texts_lower)
+    return {
+        f'In {field}': [keyword in field_hits for keyword in keywords_lower]
+        for field, field_hits in zip(SEO_FIELDS, hits)
+    }
+
+def report_chunk(top_df, crawl_map):
+    """Build report rows for a set of URLs (may run in a worker process)"""
+    report_df = top_df[['URL', 'Keyword', 'Clicks', 'Position']].reset_index(drop=True)
+    keywords_lower = report_df['Keyword'].astype(str).str.lower().str.strip()
+    
+    # Fill the presence columns URL by URL, one scan per field
+    flag_columns = {f'In {field}': np.zeros(len(report_df), dtype=bool) for field in SEO_FIELDS}
+    for url, positions in report_df.groupby('URL', sort=False, observed=True).indices.items():
+        crawl_data = crawl_map.get(url)
+        if crawl_data is None:
+            # No crawl data; the keywords stay flagged as missing everywhere
+            continue
+        presence = keyword_presence(keywords_lower.iloc[positions].tolist(), crawl_data)
+        for column, flags in presence.items():
+            flag_columns[column][positions] = flags
+    
+    return report_df.assign(**flag_columns)